@@ -1,4 +1,6 @@
 from typing import Any
+import asyncio
+import atexit
 import subprocess
 import os
 import tempfile
@@ -8,18 +10,39 @@ from mcp.server.fastmcp import FastMCP
 from PIL import Image, ImageDraw, ImageFont
 import io
 import uiautomator2 as u2
-from xml.etree import ElementTree
+import adbutils
+from lxml import etree
 import re
-import random
 import signal
 import threading
 
 # Initialize FastMCP server
 mcp = FastMCP("android-puppeteer", "Puppeteer for Android")
 
+# Timeouts (seconds) for adb calls so an unresponsive device can't hang the server
+ADB_SHORT_TIMEOUT = 5
+ADB_SCREENSHOT_TIMEOUT = 15
+
+# Printed after each tap in a tap batch so a failed chain can be traced to the tap that broke it
+TAP_DONE_MARKER = '__TAP_DONE__'
+
 # Global dictionary to track active video recordings
 active_recordings = {}
 
+# Persistent adb shell sessions keyed by device ID
+_adb_shells = {}
+_adb_shells_lock = threading.Lock()
+
+# Cached uiautomator2 device connections keyed by device ID
+_u2_devices = {}
+_u2_devices_lock = threading.Lock()
+
+# Immutable device properties (name, dimensions) keyed by device ID
+_device_info_cache = {}
+
+# Physical screen sizes (width, height) keyed by device ID
+_device_size_cache = {}
+
 
 # Element detection classes
 @dataclass
@@ -53,7 +76,7 @@ class ElementNode:
 
 
 # Interactive element classes (common Android UI elements)
-INTERACTIVE_CLASSES = [
+INTERACTIVE_CLASSES = frozenset({
     "android.widget.Button",
     "android.widget.ImageButton",
     "android.widget.EditText",
@@ -74,15 +97,69 @@ INTERACTIVE_CLASSES = [
     "android.widget.HorizontalScrollView",
     "androidx.viewpager.widget.ViewPager",
     "androidx.viewpager2.widget.ViewPager2"
+})
+
+# Scrollable container classes
+SCROLLABLE_CLASSES = frozenset({
+    "android.widget.ScrollView",
+    "android.widget.HorizontalScrollView",
+    "android.support.v7.widget.RecyclerView",
+    "androidx.recyclerview.widget.RecyclerView",
+    "android.widget.ListView",
+    "android.widget.GridView",
+    "androidx.viewpager.widget.ViewPager",
+    "androidx.viewpager2.widget.ViewPager2"
+})
+
+# Distinct colors for annotation boxes, cycled by element index
+ANNOTATION_PALETTE = [
+    '#e6194b', '#3cb44b', '#ffe119', '#4363d8', '#f58231',
+    '#911eb4', '#46f0f0', '#f032e6', '#bcf60c', '#fabebe',
+    '#008080', '#e6beff', '#9a6324', '#fffac8', '#800000',
+    '#aaffc3', '#808000', '#ffd8b1', '#000075', '#808080'
 ]
 
 
+def load_font(font_size: int):
+    """Load Arial at the given size, falling back to PIL's default font"""
+    try:
+        return ImageFont.truetype('arial.ttf', font_size)
+    except (OSError, IOError):
+        try:
+            return ImageFont.truetype('/System/Library/Fonts/Arial.ttf', font_size)
+        except (OSError, IOError):
+            return ImageFont.load_default()
+
+
+# Label font for annotated screenshots, loaded once instead of on every screenshot
+ANNOTATION_FONT = load_font(12)
+
+# Precompiled patterns for parsing adb output and the UI hierarchy
+BOUNDS_PATTERN = re.compile(r'\[(\d+),(\d+)]\[(\d+),(\d+)]')
+PROP_PATTERN = re.compile(r'\[([^\]]+)\]: \[([^\]]*)\]')
+PHYSICAL_SIZE_PATTERN = re.compile(r'Physical size:\s*(\d+)x(\d+)')
+ADB_DEVICE_PATTERN = re.compile(rb'^(\S+)\t([^\r\n]+)', re.MULTILINE)
+# Visible, enabled nodes that are clickable, focusable or of an interactive class
+INTERACTIVE_NODES_XPATH = etree.XPath(
+    './/node[@visible-to-user="true" and @enabled="true"'
+    ' and (@clickable="true" or @focusable="true" or '
+    + ' or '.join(f'@class="{class_name}"' for class_name in sorted(INTERACTIVE_CLASSES))
+    + ')]'
+)
+# Text of each direct TextView child, falling back to its content description when the text is empty
+TEXT_CHILDREN_XPATH = etree.XPath(
+    './node[@class="android.widget.TextView"]/@text[. != ""]'
+    ' | ./node[@class="android.widget.TextView"][not(@text) or @text = ""]/@content-desc',
+    smart_strings=False
+)
+
+
 # Utility functions
 def extract_coordinates(node):
     """Extract coordinates from Android UI hierarchy node bounds attribute"""
     attributes = node.attrib
     bounds = attributes.get('bounds')
-    match = re.search(r'\[(\d+),(\d+)]\[(\d+),(\d+)]', bounds)
+    match = BOUNDS_PATTERN.match(bounds) if bounds else None
     if match:
         x1, y1, x2, y2 = map(int, match.groups())
         return x1, y1, x2, y2
@@ -98,20 +175,191 @@ def get_center_coordinates(coordinates: tuple[int, int, int, int]):
 def get_element_name(node) -> str:
     """Get a human-readable name for the UI element"""
     # Try to get text content first, then content description
-    name = "".join([n.get('text') or n.get('content-desc') for n in node if n.get('class') == "android.widget.TextView"]) or node.get('content-desc') or node.get('text')
+    name = "".join(TEXT_CHILDREN_XPATH(node)) or node.get('content-desc') or node.get('text')
     return name if name else f"{node.get('class', 'Unknown').split('.')[-1]}"
 
 
-def is_interactive(node) -> bool:
-    """Check if a UI element is interactive"""
-    attributes = node.attrib
-    return (attributes.get('focusable') == "true" or
-            attributes.get('clickable') == "true" or
-            attributes.get('class') in INTERACTIVE_CLASSES)
+class AdbShellError(subprocess.CalledProcessError):
+    """adb itself failed (no device, device offline, ...) before a shell command could run"""
+
+
+class PersistentAdbShell:
+    """Long-lived `adb shell` session that runs commands over a single adb connection"""
+
+    SENTINEL = '__END__'
+    SENTINEL_PATTERN = re.compile(rf'{SENTINEL}(\d+)')
+
+    def __init__(self, device_id: str = None):
+        self.device_id = device_id
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Spawn the underlying `adb shell` process"""
+        cmd = ['adb']
+        if self.device_id:
+            cmd.extend(['-s', self.device_id])
+        cmd.append('shell')
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+
+    def close(self):
+        """Terminate the shell session if it is running"""
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def run(self, command: str, timeout: float = ADB_SHORT_TIMEOUT) -> tuple[str, int]:
+        """Run a shell command in the session and return its output and exit code"""
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+
+            # Kill the session if the command doesn't finish in time, which unblocks the read below
+            process = self.process
+            timed_out = threading.Event()
+
+            def on_timeout():
+                timed_out.set()
+                process.kill()
+
+            watchdog = threading.Timer(timeout, on_timeout)
+            watchdog.start()
+            try:
+                output = []
+                try:
+                    # Echo a sentinel carrying the exit code so we know where the output ends
+                    process.stdin.write(f"{command}; echo {self.SENTINEL}$?\n".encode())
+                    process.stdin.flush()
+                except BrokenPipeError:
+                    # adb already exited (e.g. no device); fall through to read its error message
+                    pass
+
+                while True:
+                    line = process.stdout.readline()
+                    if not line:
+                        returncode = process.wait()
+                        self.close()
+                        if timed_out.is_set():
+                            raise subprocess.TimeoutExpired(command, timeout)
+                        if returncode != 0:
+                            # adb itself failed (no device, device offline, ...), report it like a failed adb call
+                            message = ''.join(output).strip()
+                            raise AdbShellError(returncode, process.args, output=message, stderr=message)
+                        raise ConnectionError(
+                            f"adb shell session for device {self.device_id or 'default'} closed unexpectedly: "
+                            f"{''.join(output).strip()}"
+                        )
+                    line = line.decode(errors='replace')
+                    match = self.SENTINEL_PATTERN.search(line)
+                    if match:
+                        output.append(line[:match.start()])
+                        return ''.join(output).replace('\r', ''), int(match.group(1))
+                    output.append(line)
+            finally:
+                watchdog.cancel()
+
+
+def get_adb_shell(device_id: str = None) -> PersistentAdbShell:
+    """Get the persistent adb shell session for a device, creating it on first use"""
+    with _adb_shells_lock:
+        shell = _adb_shells.get(device_id)
+        if shell is None:
+            shell = PersistentAdbShell(device_id)
+            _adb_shells[device_id] = shell
+        return shell
+
+
+def close_adb_shells():
+    """Terminate every persistent adb shell session"""
+    with _adb_shells_lock:
+        for shell in _adb_shells.values():
+            shell.close()
+        _adb_shells.clear()
+
+
+atexit.register(close_adb_shells)
+
+
+async def run_adb(*args: str, device_id: str = None, timeout: float = ADB_SHORT_TIMEOUT, check: bool = False) -> tuple[int, bytes, bytes]:
+    """Run an adb command without blocking the event loop and return its exit code, stdout and stderr"""
+    cmd = ['adb']
+    if device_id:
+        cmd.extend(['-s', device_id])
+    cmd.extend(args)
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        # Don't leave adb running when the call times out or the calling task is cancelled
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=stdout, stderr=stderr)
+    return process.returncode, stdout, stderr
+
+
+async def run_adb_to_file(filepath: str, *args: str, device_id: str = None, timeout: float = ADB_SHORT_TIMEOUT):
+    """Run an adb command with its stdout written straight to a file, leaving any existing file untouched on failure"""
+    cmd = ['adb']
+    if device_id:
+        cmd.extend(['-s', device_id])
+    cmd.extend(args)
+
+    # Stream into a temporary file next to the target and move it into place only once adb succeeded
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            process = await asyncio.create_subprocess_exec(*cmd, stdout=f, stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            finally:
+                # Stop adb before the temporary file is removed below, so it can't keep writing into it
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+async def run_shell_command(device_id: str, command: str, timeout: float = ADB_SHORT_TIMEOUT) -> str:
+    """Run a command in the device's persistent adb shell, raising CalledProcessError on failure"""
+    output, returncode = await asyncio.to_thread(get_adb_shell(device_id).run, command, timeout)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, output=output, stderr=output)
+    return output
 
 
 def get_device_connection(device_id: str = None):
-    """Get uiautomator2 device connection"""
+    """Get uiautomator2 device connection, reusing the cached one when available"""
+    with _u2_devices_lock:
+        device = _u2_devices.get(device_id)
+    if device is not None:
+        return device
+
+    # Connect outside the lock so a slow device doesn't hold up connections to other devices
     try:
         if device_id:
             device = u2.connect(device_id)
@@ -119,90 +367,125 @@ def get_device_connection(device_id: str = None):
             device = u2.connect()  # Connect to default device
         # Test connection
         device.info
-        return device
     except Exception as e:
         raise ConnectionError(f"Failed to connect to device {device_id}: {e}")
 
+    # u2 binds the connection to whichever device is the default right now, and that can change
+    # between calls, so only cache explicitly targeted devices
+    if not device_id:
+        return device
+
+    with _u2_devices_lock:
+        # Keep whichever connection was cached first if another thread raced us
+        return _u2_devices.setdefault(device_id, device)
+
+
+def forget_device_connection(device_id: str, device=None):
+    """Drop the cached uiautomator2 connection of a device, only if it is still the given one when provided"""
+    with _u2_devices_lock:
+        if device is None or _u2_devices.get(device_id) is device:
+            _u2_devices.pop(device_id, None)
+
+
+def run_with_device(device_id: str, action):
+    """Run action(device) on the cached connection, dropping the connection if the device has gone away.
+
+    The action is not replayed: it may have reached the device before failing, and repeating a gesture
+    or text input would apply it twice. The next call reconnects instead.
+    """
+    device = get_device_connection(device_id)
+    try:
+        return action(device)
+    except (adbutils.AdbError, u2.exceptions.DeviceError):
+        forget_device_connection(device_id, device)
+        raise
+
 
 def get_ui_elements(device_id: str = None) -> list[ElementNode]:
     """Get interactive UI elements from the device"""
     try:
-        device = get_device_connection(device_id)
-
         # Get UI hierarchy XML
-        tree_string = device.dump_hierarchy()
-        element_tree = ElementTree.fromstring(tree_string)
+        tree_string = run_with_device(device_id, lambda device: device.dump_hierarchy())
+        element_tree = etree.fromstring(tree_string.encode('utf-8'))
 
         interactive_elements = []
-        nodes = element_tree.findall('.//node[@visible-to-user="true"][@enabled="true"]')
+        nodes = INTERACTIVE_NODES_XPATH(element_tree)
 
         for node in nodes:
-            if is_interactive(node):
-                coords = extract_coordinates(node)
-                if not coords:
-                    continue
+            coords = extract_coordinates(node)
+            if not coords:
+                continue
 
-                x1, y1, x2, y2 = coords
-                name = get_element_name(node)
+            x1, y1, x2, y2 = coords
+            name = get_element_name(node)
 
-                if not name:
-                    continue
+            if not name:
+                continue
 
-                x_center, y_center = get_center_coordinates((x1, y1, x2, y2))
+            x_center, y_center = get_center_coordinates((x1, y1, x2, y2))
 
-                interactive_elements.append(ElementNode(
-                    name=name,
-                    coordinates=CenterCord(x=x_center, y=y_center),
-                    bounding_box=BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2),
-                    class_name=node.get('class', ''),
-                    clickable=node.get('clickable') == 'true',
-                    focusable=node.get('focusable') == 'true'
-                ))
+            interactive_elements.append(ElementNode(
+                name=name,
+                coordinates=CenterCord(x=x_center, y=y_center),
+                bounding_box=BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2),
+                class_name=node.get('class', ''),
+                clickable=node.get('clickable') == 'true',
+                focusable=node.get('focusable') == 'true'
+            ))
 
         return interactive_elements
     except Exception as e:
         raise RuntimeError(f"Failed to get UI elements: {e}")
 
 
-def annotated_screenshot(device_id: str = None) -> tuple[Image.Image, list[ElementNode]]:
-    """Take screenshot and annotate with UI elements"""
-    try:
-        # Get screenshot using adb
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-        cmd.extend(['exec-out', 'screencap', '-p'])
-
-        result = subprocess.run(cmd, capture_output=True, check=True)
-        screenshot = Image.open(io.BytesIO(result.stdout))
+def downscale_screenshot(screenshot: Image.Image, scale: float) -> Image.Image:
+    """Shrink a screenshot by the given factor, returning it unchanged at scale 1"""
+    if scale == 1.0:
+        return screenshot
+    # Whole-number factors (e.g. scale 0.5) use reduce, a cheap box filter, instead of a full resample
+    factor = round(1 / scale)
+    if abs(1 / scale - factor) < 1e-9:
+        return screenshot.reduce(factor)
+    new_size = (max(int(screenshot.width * scale), 1), max(int(screenshot.height * scale), 1))
+    return screenshot.resize(new_size, Image.Resampling.BILINEAR)
 
-        # Get UI elements
-        nodes = get_ui_elements(device_id)
 
-        # Use original screenshot without padding
-        draw = ImageDraw.Draw(screenshot)
-        font_size = 12
+async def annotated_screenshot(device_id: str = None, scale: float = 1.0) -> tuple[Image.Image, list[ElementNode]]:
+    """Take screenshot and annotate with UI elements, optionally downscaled by scale"""
+    try:
+        # Capture the screenshot and the UI elements concurrently, they don't depend on each other
+        tasks = (
+            asyncio.create_task(run_adb(
+                'exec-out', 'screencap', '-p', device_id=device_id, timeout=ADB_SCREENSHOT_TIMEOUT, check=True
+            )),
+            asyncio.create_task(asyncio.to_thread(get_ui_elements, device_id))
+        )
         try:
-            font = ImageFont.truetype('arial.ttf', font_size)
-        except (OSError, IOError):
-            try:
-                font = ImageFont.truetype('/System/Library/Fonts/Arial.ttf', font_size)
-            except (OSError, IOError):
-                font = ImageFont.load_default()
-
-        def get_random_color():
-            return "#{:06x}".format(random.randint(0, 0xFFFFFF))
+            (_, stdout, _), nodes = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather leaves the other capture running when one fails; stop it (killing a running screencap)
+            # so callers falling back to a plain screenshot don't load the device twice
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        # Downscale before drawing so annotation and encoding work on fewer pixels
+        screenshot = downscale_screenshot(Image.open(io.BytesIO(stdout)), scale)
+
+        # Use screenshot without padding
+        draw = ImageDraw.Draw(screenshot)
+        font = ANNOTATION_FONT
 
         def draw_annotation(label, node: ElementNode):
             bounding_box = node.bounding_box
-            color = get_random_color()
+            color = ANNOTATION_PALETTE[label % len(ANNOTATION_PALETTE)]
 
-            # Use original coordinates without scaling or padding
+            # Map device coordinates onto the (possibly downscaled) screenshot, without padding
             adjusted_box = (
-                bounding_box.x1,
-                bounding_box.y1,
-                bounding_box.x2,
-                bounding_box.y2
+                int(bounding_box.x1 * scale),
+                int(bounding_box.y1 * scale),
+                int(bounding_box.x2 * scale),
+                int(bounding_box.y2 * scale)
             )
 
             # Draw bounding box
@@ -235,72 +518,158 @@ def annotated_screenshot(device_id: str = None) -> tuple[Image.Image, list[Eleme
         raise RuntimeError(f"Failed to create annotated screenshot: {e}")
 
 
+async def run_adb_probe(device_id: str, *args: str, timeout: float = ADB_SHORT_TIMEOUT) -> str | None:
+    """Run a short adb command against a device, returning its stripped output or None on failure"""
+    try:
+        returncode, stdout, _ = await run_adb(*args, device_id=device_id, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None
+    if returncode != 0:
+        return None
+    return stdout.decode(errors='replace').strip()
+
+
+async def run_shell_probe(device_id: str, command: str) -> str | None:
+    """Run a command in the device's persistent adb shell, returning its stripped output or None on failure"""
+    try:
+        output = await run_shell_command(device_id, command)
+    except (ConnectionError, OSError, subprocess.SubprocessError):
+        return None
+    return output.strip()
+
+
+async def fetch_device_metadata(device_id: str) -> dict:
+    """Fetch the name, properties and screen dimensions of a device with a single shell round-trip"""
+    # getprop lines look like "[key]: [value]" and wm size prints "Physical size: WxH", so one output holds both
+    output = await run_shell_probe(device_id, 'getprop; wm size') or ''
+    props = dict(PROP_PATTERN.findall(output))
+
+    # Emulators are named after their AVD, physical devices after their model
+    name = props.get('ro.product.model')
+    if device_id and device_id.startswith('emulator-'):
+        # Emulators expose the AVD name as a property; `emu avd name` returns nothing on newer ones
+        avd_name = props.get('ro.kernel.qemu.avd_name') or props.get('ro.boot.qemu.avd_name')
+        if not avd_name:
+            avd_output = await run_adb_probe(device_id, 'emu', 'avd', 'name')
+            # The console reply ends with an "OK" status line
+            avd_name = avd_output.splitlines()[0].strip() if avd_output else None
+        name = avd_name
+
+    # Get device dimensions
+    width, height, dimensions = None, None, None
+    match = PHYSICAL_SIZE_PATTERN.search(output)
+    if match:
+        width, height = map(int, match.groups())
+        dimensions = f"{width}x{height}"
+
+    return {
+        "name": name if name is not None else "Unknown",
+        "model": props.get('ro.product.model'),
+        "manufacturer": props.get('ro.product.manufacturer'),
+        "android_version": props.get('ro.build.version.release'),
+        "sdk_version": props.get('ro.build.version.sdk'),
+        "width": width,
+        "height": height,
+        "dimensions": dimensions
+    }
+
+
+# Metadata fields reported for devices that could not be probed
+UNKNOWN_DEVICE_META_FIELDS = (
+    "name", "model", "manufacturer", "android_version", "sdk_version", "width", "height", "dimensions"
+)
+
+
+async def get_cached_device_meta(device_id: str = None) -> dict:
+    """Get the name and screen dimensions of a device, probing it only on the first call"""
+    meta = _device_info_cache.get(device_id)
+    if meta is None:
+        meta = await fetch_device_metadata(device_id)
+        # Only remember complete results so a transient probe failure is retried next time:
+        # ro.build.version.sdk is set on every device, so its absence means getprop failed.
+        # The default device can change between calls, so only cache explicitly targeted devices
+        if device_id and meta["dimensions"] and meta["sdk_version"]:
+            _device_info_cache[device_id] = meta
+    return meta
+
+
+def clear_device_cache(device_id: str = None):
+    """Forget cached device properties for one device, or for every device if no ID is given"""
+    if device_id is None:
+        _device_info_cache.clear()
+        _device_size_cache.clear()
+    else:
+        _device_info_cache.pop(device_id, None)
+        _device_size_cache.pop(device_id, None)
+
+
+async def get_device_size(device_id: str = None) -> tuple[int, int] | None:
+    """Get the physical screen size of a device with `wm size`, probing a given device only on the first call.
+
+    adb failures propagate to the caller; None means wm size reported no physical size.
+    """
+    size = _device_size_cache.get(device_id)
+    if size is None:
+        output = await run_shell_command(device_id, 'wm size')
+        match = PHYSICAL_SIZE_PATTERN.search(output)
+        if not match:
+            return None
+        size = tuple(map(int, match.groups()))
+        # The default device can change between calls, so only cache explicitly targeted devices
+        if device_id:
+            _device_size_cache[device_id] = size
+    return size
+
+
 @mcp.tool()
 async def list_emulators() -> dict:
     """List all available Android emulators and devices with their name, ID, status, and dimensions"""
     try:
         # Execute adb devices to get connected devices/emulators
-        result = subprocess.run(['adb', 'devices'], capture_output=True, text=True, check=True)
+        _, stdout, _ = await run_adb('devices', check=True)
+
+        # Each device line is "<id>\t<status>"; the header and daemon messages have no tab
+        device_entries = [
+            (match.group(1).decode(), match.group(2).decode())
+            for match in ADB_DEVICE_PATTERN.finditer(stdout)
+        ]
+
+        # Forget cached properties and connections of devices that have disconnected, a new device may reuse the ID
+        connected_ids = {device_id for device_id, _ in device_entries}
+        with _u2_devices_lock:
+            u2_device_ids = set(_u2_devices)
+        for cached_id in set(_device_info_cache) | set(_device_size_cache) | u2_device_ids:
+            if cached_id not in connected_ids:
+                clear_device_cache(cached_id)
+                forget_device_connection(cached_id)
+
+        # Fetch metadata for all online devices concurrently; offline or unauthorized ones can't be probed
+        metadata = await asyncio.gather(
+            *[get_cached_device_meta(device_id) for device_id, status in device_entries if status == 'device'],
+            return_exceptions=True
+        )
+        online_metadata = iter(metadata)
 
         devices = []
-        lines = result.stdout.strip().split('\n')[1:]  # Skip header line
-
-        for line in lines:
-            if line.strip():
-                parts = line.strip().split('\t')
-                if len(parts) >= 2:
-                    device_id = parts[0]
-                    status = parts[1]
-
-                    # Try to get AVD name if it's an emulator
-                    avd_name = "Unknown"
-                    if device_id.startswith('emulator-'):
-                        try:
-                            avd_result = subprocess.run(
-                                ['adb', '-s', device_id, 'emu', 'avd', 'name'],
-                                capture_output=True, text=True, timeout=5
-                            )
-                            if avd_result.returncode == 0:
-                                avd_name = avd_result.stdout.strip()
-                        except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
-                            pass
-                    else:
-                        # For physical devices, try to get device model
-                        try:
-                            model_result = subprocess.run(
-                                ['adb', '-s', device_id, 'shell', 'getprop', 'ro.product.model'],
-                                capture_output=True, text=True, timeout=5
-                            )
-                            if model_result.returncode == 0:
-                                avd_name = model_result.stdout.strip()
-                        except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
-                            pass
-
-                    # Get device dimensions
-                    width, height, dimensions = None, None, None
-                    try:
-                        size_result = subprocess.run(
-                            ['adb', '-s', device_id, 'shell', 'wm', 'size'],
-                            capture_output=True, text=True, timeout=5
-                        )
-                        if size_result.returncode == 0:
-                            output = size_result.stdout.strip()
-                            if 'Physical size:' in output:
-                                size_part = output.split('Physical size:')[1].strip()
-                                width, height = map(int, size_part.split('x'))
-                                dimensions = f"{width}x{height}"
-                    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, ValueError):
-                        pass
-
-                    devices.append({
-                        "id": device_id,
-                        "name": avd_name,
-                        "status": status,
-                        "type": "emulator" if device_id.startswith('emulator-') else "device",
-                        "width": width,
-                        "height": height,
-                        "dimensions": dimensions
-                    })
+        for device_id, status in device_entries:
+            meta = next(online_metadata) if status == 'device' else None
+            if not isinstance(meta, dict):
+                # A failed probe shouldn't hide the device from the listing
+                meta = dict.fromkeys(UNKNOWN_DEVICE_META_FIELDS)
+                meta["name"] = "Unknown"
+            devices.append({
+                "id": device_id,
+                "name": meta["name"],
+                "status": status,
+                "type": "emulator" if device_id.startswith('emulator-') else "device",
+                "model": meta["model"],
+                "manufacturer": meta["manufacturer"],
+                "android_version": meta["android_version"],
+                "sdk_version": meta["sdk_version"],
+                "width": meta["width"],
+                "height": meta["height"],
+                "dimensions": meta["dimensions"]
+            })
 
         return {
             "success": True,
@@ -308,6 +677,13 @@ async def list_emulators() -> dict:
             "count": len(devices)
         }
 
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "devices": [],
+            "count": 0
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
@@ -332,10 +708,18 @@ async def list_emulators() -> dict:
 
 
 @mcp.tool()
-async def take_screenshot(device_id: str = None, name: str = None, annotate_elements: bool = True) -> dict:
+async def take_screenshot(device_id: str = None, name: str = None, annotate_elements: bool = True, scale: float = 1.0) -> dict:
     """Take a screenshot for the specified device/emulator. If no device_id is provided, uses the default device.
-    Set annotate_elements=False to take a plain screenshot without UI element annotations."""
+    Set annotate_elements=False to take a plain screenshot without UI element annotations.
+    Set scale below 1.0 (e.g. 0.5) to save a smaller image; element coordinates stay in device pixels."""
     try:
+        if not 0 < scale <= 1:
+            return {
+                "success": False,
+                "error": "Scale must be greater than 0 and at most 1",
+                "filepath": None
+            }
+
         # Use android-puppeteer/ss directory for screenshots
         current_dir = os.path.dirname(os.path.abspath(__file__))
         screenshots_dir = os.path.join(current_dir, "ss")
@@ -354,20 +738,14 @@ async def take_screenshot(device_id: str = None, name: str = None, annotate_elem
             filename = f"screenshot_{timestamp}.png"
         filepath = os.path.join(screenshots_dir, filename)
 
-        # Build adb command
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-        cmd.extend(['exec-out', 'screencap', '-p'])
-
         # Use annotated screenshot by default
         if annotate_elements:
             try:
                 # Use annotated screenshot with UI elements
-                annotated_img, ui_elements = annotated_screenshot(device_id)
+                annotated_img, ui_elements = await annotated_screenshot(device_id, scale)
 
-                # Save the annotated image
-                annotated_img.save(filepath, 'PNG')
+                # Save the annotated image; fast compression since screenshots are short-lived
+                await asyncio.to_thread(annotated_img.save, filepath, 'PNG', optimize=False, compress_level=1)
 
                 # Convert UI elements to the same format as get_ui_elements_info
                 elements_info = []
@@ -398,27 +776,42 @@ async def take_screenshot(device_id: str = None, name: str = None, annotate_elem
                     "device_id": device_id or "default",
                     "ui_elements_count": len(ui_elements),
                     "ui_elements": elements_info,
-                    "annotated": True
+                    "annotated": True,
+                    "scale": scale
                 }
             except Exception as e:
                 # Fallback to regular screenshot if annotation fails
                 pass
 
         # Take regular screenshot without annotations
-        result = subprocess.run(cmd, capture_output=True, check=True)
-
-        # Save the plain screenshot
-        with open(filepath, 'wb') as f:
-            f.write(result.stdout)
+        if scale == 1.0:
+            # Stream the plain screenshot from adb straight into the file
+            await run_adb_to_file(
+                filepath, 'exec-out', 'screencap', '-p', device_id=device_id, timeout=ADB_SCREENSHOT_TIMEOUT
+            )
+        else:
+            # Resizing needs the decoded image, so capture into memory first
+            _, stdout, _ = await run_adb(
+                'exec-out', 'screencap', '-p', device_id=device_id, timeout=ADB_SCREENSHOT_TIMEOUT, check=True
+            )
+            screenshot = downscale_screenshot(Image.open(io.BytesIO(stdout)), scale)
+            await asyncio.to_thread(screenshot.save, filepath, 'PNG', optimize=False, compress_level=1)
 
         return {
             "success": True,
             "message": f"Screenshot saved successfully",
             "filepath": filepath,
             "filename": filename,
-            "device_id": device_id or "default"
+            "device_id": device_id or "default",
+            "scale": scale
         }
 
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "filepath": None
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
@@ -458,22 +851,17 @@ async def press(x: int, y: int, device_id: str = None, duration: int = None) ->
                 "y": y
             }
 
-        # Build adb command
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-
         if duration and duration > 0:
             # Long press using swipe command (swipe from point to same point with duration)
-            cmd.extend(['shell', 'input', 'swipe', str(x), str(y), str(x), str(y), str(duration)])
+            command = f"input swipe {x} {y} {x} {y} {duration}"
             action_type = f"long press ({duration}ms)"
         else:
             # Regular tap
-            cmd.extend(['shell', 'input', 'tap', str(x), str(y)])
+            command = f"input tap {x} {y}"
             action_type = "tap"
 
         # Execute tap command
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        await run_shell_command(device_id, command, timeout=ADB_SHORT_TIMEOUT + max(duration or 0, 0) / 1000)
 
         return {
             "success": True,
@@ -484,6 +872,13 @@ async def press(x: int, y: int, device_id: str = None, duration: int = None) ->
             "device_id": device_id or "default"
         }
 
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "x": x,
+            "y": y
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
@@ -508,6 +903,107 @@ async def press(x: int, y: int, device_id: str = None, duration: int = None) ->
         }
 
 
+@mcp.tool()
+async def tap_batch(taps: list[dict], device_id: str = None) -> dict:
+    """Execute a sequence of taps in order over a single adb shell round-trip.
+
+    Args:
+        taps: List of taps, each {"x": int, "y": int} with an optional "duration" in milliseconds for a long press
+        device_id: Optional device ID to target specific device/emulator
+    """
+    try:
+        if not taps:
+            return {
+                "success": False,
+                "error": "Taps list cannot be empty",
+                "taps": taps
+            }
+
+        # Validate every tap before sending anything to the device
+        commands = []
+        total_duration = 0
+        for i, tap in enumerate(taps):
+            if not isinstance(tap, dict):
+                return {
+                    "success": False,
+                    "error": f"Tap {i} must be an object with x and y coordinates",
+                    "taps": taps
+                }
+
+            # bool is a subclass of int, so reject it explicitly
+            x, y, duration = tap.get("x"), tap.get("y"), tap.get("duration")
+            if any(not isinstance(v, int) or isinstance(v, bool) or v < 0 for v in (x, y)):
+                return {
+                    "success": False,
+                    "error": f"Tap {i} must have positive integer coordinates",
+                    "taps": taps
+                }
+            if duration is not None and (not isinstance(duration, int) or isinstance(duration, bool) or duration < 0):
+                return {
+                    "success": False,
+                    "error": f"Tap {i} duration must be a non-negative integer number of milliseconds",
+                    "taps": taps
+                }
+
+            if duration:
+                # Long press using swipe command (swipe from point to same point with duration)
+                commands.append(f"input swipe {x} {y} {x} {y} {duration}")
+                total_duration += duration
+            else:
+                commands.append(f"input tap {x} {y}")
+
+        # Chain the taps so they run back to back and stop at the first failure,
+        # echoing a marker after each one so a failure can be traced to its tap
+        await run_shell_command(
+            device_id, f" && echo {TAP_DONE_MARKER} && ".join(commands),
+            timeout=ADB_SHORT_TIMEOUT + len(commands) + total_duration / 1000
+        )
+
+        return {
+            "success": True,
+            "message": f"Successfully executed {len(commands)} taps",
+            "count": len(commands),
+            "action_type": "tap_batch",
+            "device_id": device_id or "default"
+        }
+
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "action_type": "tap_batch"
+        }
+    except AdbShellError as e:
+        # adb never reached the device, so no tap ran and none of them is to blame
+        return {
+            "success": False,
+            "error": f"Failed to execute taps: {e}",
+            "stderr": e.stderr if e.stderr else "",
+            "action_type": "tap_batch"
+        }
+    except subprocess.CalledProcessError as e:
+        completed = (e.output or "").count(TAP_DONE_MARKER)
+        return {
+            "success": False,
+            "error": f"Failed to execute tap {completed}: {e}",
+            "stderr": (e.stderr or "").replace(f"{TAP_DONE_MARKER}\n", ""),
+            "failed_tap": completed,
+            "action_type": "tap_batch"
+        }
+    except FileNotFoundError:
+        return {
+            "success": False,
+            "error": "ADB not found. Please ensure Android SDK is installed and adb is in PATH.",
+            "action_type": "tap_batch"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Unexpected error: {e}",
+            "action_type": "tap_batch"
+        }
+
+
 @mcp.tool()
 async def long_press(x: int, y: int, device_id: str = None) -> dict:
     """Long press on specific coordinates on the Android screen."""
@@ -521,15 +1017,12 @@ async def long_press(x: int, y: int, device_id: str = None) -> dict:
                 "y": y
             }
 
-        # Get device connection
-        device = get_device_connection(device_id)
-
         # Execute long press using gesture with 1.5 second duration
         # Long press with gesture: [ (x, y, delay_ms) ]
-        device.gesture(
+        await asyncio.to_thread(run_with_device, device_id, lambda device: device.gesture(
             (x, y, 0),     # touch down immediately
             (x, y, 1500)   # stay at same position for 1500 ms (1.5 seconds)
-        )
+        ))
 
         return {
             "success": True,
@@ -561,7 +1054,7 @@ async def long_press(x: int, y: int, device_id: str = None) -> dict:
 async def get_ui_elements_info(device_id: str = None) -> dict:
     """Get detailed information about all interactive UI elements on the screen including their coordinates and properties."""
     try:
-        elements = get_ui_elements(device_id)
+        elements = await asyncio.to_thread(get_ui_elements, device_id)
 
         elements_info = []
         for i, element in enumerate(elements):
@@ -611,19 +1104,10 @@ async def get_ui_elements_info(device_id: str = None) -> dict:
 async def get_device_dimensions(device_id: str = None) -> dict:
     """Get the dimensions of the Android device/emulator screen."""
     try:
-        # Get device dimensions using adb
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-        cmd.extend(['shell', 'wm', 'size'])
-
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        output = result.stdout.strip()
+        # Device dimensions don't change, so reuse the cached wm size result
+        size = await get_device_size(device_id)
 
-        width, height = None, None
-        if 'Physical size:' in output:
-            size_part = output.split('Physical size:')[1].strip()
-            width, height = map(int, size_part.split('x'))
+        width, height = size if size else (None, None)
 
         return {
             "success": True,
@@ -633,12 +1117,24 @@ async def get_device_dimensions(device_id: str = None) -> dict:
             "dimensions": f"{width}x{height}" if width and height else None
         }
 
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "device_id": device_id or "default"
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
             "error": f"Failed to get device dimensions: {e}",
             "device_id": device_id or "default"
         }
+    except FileNotFoundError:
+        return {
+            "success": False,
+            "error": "ADB not found. Please ensure Android SDK is installed and adb is in PATH.",
+            "device_id": device_id or "default"
+        }
     except Exception as e:
         return {
             "success": False,
@@ -651,14 +1147,8 @@ async def get_device_dimensions(device_id: str = None) -> dict:
 async def press_back(device_id: str = None) -> dict:
     """Press the hardware back button on the Android device/emulator."""
     try:
-        # Build adb command for back button press
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-        cmd.extend(['shell', 'input', 'keyevent', 'KEYCODE_BACK'])
-
         # Execute back button press command
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        await run_shell_command(device_id, 'input keyevent KEYCODE_BACK')
 
         return {
             "success": True,
@@ -667,6 +1157,12 @@ async def press_back(device_id: str = None) -> dict:
             "device_id": device_id or "default"
         }
 
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "action_type": "back_press"
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
@@ -767,14 +1263,10 @@ async def swipe(direction: str = None, x1: int = None, y1: int = None, x2: int =
                 "coordinates": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
             }
 
-        # Build adb swipe command
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-        cmd.extend(['shell', 'input', 'swipe', str(x1), str(y1), str(x2), str(y2), str(duration)])
-
         # Execute swipe command
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        await run_shell_command(
+            device_id, f"input swipe {x1} {y1} {x2} {y2} {duration}", timeout=ADB_SHORT_TIMEOUT + max(duration or 0, 0) / 1000
+        )
 
         # Prepare response message
         if direction:
@@ -798,6 +1290,12 @@ async def swipe(direction: str = None, x1: int = None, y1: int = None, x2: int =
             "device_id": device_id or "default"
         }
 
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "action_type": "swipe"
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
@@ -837,13 +1335,14 @@ async def type_text(text: str, device_id: str = None, clear_first: bool = False)
             }
 
         # Get device connection for uiautomator2
-        device = get_device_connection(device_id)
+        def send_text(device):
+            # Enable fast input IME for reliable text input
+            device.set_fastinput_ime(enable=True)
 
-        # Enable fast input IME for reliable text input
-        device.set_fastinput_ime(enable=True)
+            # Use uiautomator2's send_keys method which is much more reliable
+            device.send_keys(text=text, clear=clear_first)
 
-        # Use uiautomator2's send_keys method which is much more reliable
-        device.send_keys(text=text, clear=clear_first)
+        await asyncio.to_thread(run_with_device, device_id, send_text)
 
         return {
             "success": True,
@@ -909,7 +1408,7 @@ async def scroll_element(element, direction: str, distance: int = 200, duration:
             }
 
         # Get UI elements
-        elements = get_ui_elements(device_id)
+        elements = await asyncio.to_thread(get_ui_elements, device_id)
 
         if not elements:
             return {
@@ -948,18 +1447,7 @@ async def scroll_element(element, direction: str, distance: int = 200, duration:
                 }
 
         # Check if element is likely scrollable
-        scrollable_classes = [
-            "android.widget.ScrollView",
-            "android.widget.HorizontalScrollView",
-            "android.support.v7.widget.RecyclerView",
-            "androidx.recyclerview.widget.RecyclerView",
-            "android.widget.ListView",
-            "android.widget.GridView",
-            "androidx.viewpager.widget.ViewPager",
-            "androidx.viewpager2.widget.ViewPager2"
-        ]
-
-        is_scrollable = target_element.class_name in scrollable_classes
+        is_scrollable = target_element.class_name in SCROLLABLE_CLASSES
 
         # Get element bounds
         bbox = target_element.bounding_box
@@ -1000,14 +1488,11 @@ async def scroll_element(element, direction: str, distance: int = 200, duration:
         start_y = max(bbox.y1 + margin, min(start_y, bbox.y2 - margin))
         end_y = max(bbox.y1 + margin, min(end_y, bbox.y2 - margin))
 
-        # Build adb swipe command to perform scroll gesture
-        cmd = ['adb']
-        if device_id:
-            cmd.extend(['-s', device_id])
-        cmd.extend(['shell', 'input', 'swipe', str(start_x), str(start_y), str(end_x), str(end_y), str(duration)])
-
-        # Execute scroll command
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        # Execute swipe command to perform scroll gesture
+        await run_shell_command(
+            device_id, f"input swipe {start_x} {start_y} {end_x} {end_y} {duration}",
+            timeout=ADB_SHORT_TIMEOUT + max(duration or 0, 0) / 1000
+        )
 
         return {
             "success": True,
@@ -1039,6 +1524,13 @@ async def scroll_element(element, direction: str, distance: int = 200, duration:
             "element": element,
             "action_type": "element_scroll"
         }
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "error": f"adb call timed out after {e.timeout} seconds",
+            "element": element,
+            "action_type": "element_scroll"
+        }
     except subprocess.CalledProcessError as e:
         return {
             "success": False,
@@ -1125,8 +1617,7 @@ async def record_video(device_id: str = None, filename: str = None, resolution:
         )
 
         # Give the process a moment to start and check if it's still running
-        import time
-        time.sleep(1)
+        await asyncio.sleep(1)
 
         # Check if process started successfully
         if process.poll() is not None:
@@ -1217,7 +1708,7 @@ async def stop_video(device_id: str = None) -> dict:
             os.killpg(os.getpgid(process.pid), signal.SIGTERM)
 
             # Wait for the process to terminate (with timeout)
-            process.wait(timeout=10)
+            await asyncio.to_thread(process.wait, timeout=10)
 
         except subprocess.TimeoutExpired:
             # If it doesn't terminate gracefully, force kill